@@ -7,112 +7,263 @@ normalizes the logs, filters already uploaded records, and uploads new logs to G
 Supports command-line arguments for:
     --dry-run: Preview uploads without performing actual uploads.
     --since X: Include only logs from the past X days.
+    --from / --to: Include only logs in an explicit window (YYYY-MM-DD or "YYYY-MM-DD HH:MM:SS").
     --loop X: Continuously run the sync every X minutes.
     --export-simple: Save simplified logs (user_id, date, time, punch_status, log_status)
     --export-normalized: Save normalized logs (includes doc_id, timestamp, etc.)
+    --reconcile: Rebuild the local dedupe cache from Firestore with paged ID queries.
+    --prune-stale: With --reconcile, also drop cached IDs that are missing in Firestore.
+    --log-json: Write structured JSON log lines instead of plain text.
+    --summaries: Maintain per-staff daily summaries locally (cache/daily_summaries.json).
+    --push-summaries: Also write touched daily summaries to Firestore (staffDailySummaries).
+    --write-mode M: per-punch (default), packed-staff or packed-device daily documents.
+    --migrate-packed: Copy existing per-punch Firestore logs into the packed staff layout.
 
 Author: Hussain Shareef (@kudadonbe)
 Date: 2025-03-26
 """
 
-from config.settings import DEVICES
+from config.settings import DEVICES, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, WRITE_MODE
 from core.iclock_connector import get_logs_from_device
 from core.normalizer import normalize_sdk_log, convert_to_simple_log
-from core.firestore_uploader import upload_log_to_firestore
+from core.firestore_uploader import (
+    upload_log_to_firestore,
+    upload_logs_packed,
+    upload_daily_summaries,
+    stream_doc_ids,
+    stream_packed_doc_ids,
+    migrate_to_packed
+)
 from core.utils import (
     format_timestamp_str,
     load_uploaded_ids_cache,
     save_uploaded_ids_cache,
+    load_device_watermarks,
+    save_device_watermarks,
     SmartTiming
 )
+from core.logging_setup import setup_logging, EventSummary
+from core.summarizer import update_daily_summaries, load_daily_summaries, save_daily_summaries
 
 import logging
 import json
 import argparse
 import time
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from tqdm import tqdm
 from pathlib import Path
 
-# ----------------------------------------
-# Logging Configuration
-# ----------------------------------------
-LOG_DIR = Path(__file__).parent / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
-log_file = LOG_DIR / f"sync_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-
-logging.basicConfig(
-    filename=str(log_file),
-    level=logging.INFO,
-    format='[%(asctime)s] %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
 # ----------------------------------------
 # Parse Command-Line Arguments
 # ----------------------------------------
+def parse_window_bound(value):
+    """Parses a --from/--to value given as YYYY-MM-DD or YYYY-MM-DD HH:MM:SS."""
+    try:
+        bound = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date/time '{value}' (use YYYY-MM-DD or 'YYYY-MM-DD HH:MM:SS')")
+    # Device timestamps are naive local time, so offsets cannot be compared against them
+    if bound.tzinfo is not None:
+        raise argparse.ArgumentTypeError(f"invalid date/time '{value}' (time zone offsets are not supported)")
+    return bound
+
+def parse_window_end(value):
+    """Parses a --to value; a bare YYYY-MM-DD date includes that whole day."""
+    end = parse_window_bound(value)
+    try:
+        date.fromisoformat(value.strip())
+    except ValueError:
+        return end
+    return end + timedelta(days=1)
+
 parser = argparse.ArgumentParser(description="Upload iClock logs to Firestore")
 parser.add_argument("--dry-run", action="store_true", help="Preview upload without performing it")
 parser.add_argument("--since", type=int, default=None, help="Include logs from past X days")
+parser.add_argument("--from", dest="from_time", type=parse_window_bound, default=None,
+                    help="Include logs at or after this date/time (YYYY-MM-DD or 'YYYY-MM-DD HH:MM:SS')")
+parser.add_argument("--to", dest="to_time", type=parse_window_end, default=None,
+                    help="Include logs up to this date/time; a bare date includes the whole day")
 parser.add_argument("--loop", type=float, help="Continuously sync every X seconds (e.g., 5, 30, 0.5)")
 parser.add_argument("--export-simple", action="store_true", help="Export logs in simplified format (JSON array)")
 parser.add_argument("--export-normalized", action="store_true", help="Export normalized logs without uploading")
+parser.add_argument("--reconcile", action="store_true", help="Rebuild the upload cache from Firestore (bulk ID query) and report differences")
+parser.add_argument("--prune-stale", action="store_true", help="With --reconcile, drop cached IDs missing in Firestore so they are re-uploaded")
+parser.add_argument("--log-json", action="store_true", help="Write structured JSON log lines instead of plain text")
+parser.add_argument("--summaries", action="store_true", help="Maintain per-staff daily attendance summaries locally")
+parser.add_argument("--push-summaries", action="store_true", help="Also push touched daily summaries to Firestore")
+parser.add_argument("--write-mode", choices=["per-punch", "packed-staff", "packed-device"], default=WRITE_MODE,
+                    help="Firestore layout: one document per punch, or one per staff/device per day")
+parser.add_argument("--migrate-packed", action="store_true", help="Copy per-punch Firestore logs into the packed staff layout")
 args = parser.parse_args()
 
+if args.since is not None and args.from_time is not None:
+    parser.error("--since and --from cannot be used together")
+if args.from_time is not None and args.to_time is not None and args.from_time >= args.to_time:
+    parser.error("--from must be earlier than --to")
+if args.since is not None and args.to_time is not None and datetime.now() - timedelta(days=args.since) >= args.to_time:
+    parser.error("--since window starts after --to")
+
+# Packed layout ("staff"/"device") when a packed write mode is selected
+PACKED_LAYOUT = args.write_mode.split("-", 1)[1] if args.write_mode.startswith("packed-") else None
+
+# Per-punch documents carry no device name, so only the staff layout can be migrated to
+if args.migrate_packed and PACKED_LAYOUT == "device":
+    parser.error("--migrate-packed only supports the packed-staff layout, not packed-device")
+
+# ----------------------------------------
+# Logging Configuration
+# ----------------------------------------
+LOG_DIR = Path(__file__).parent / "logs"
+
+# One-off commands get their own log file so they never rotate the --loop service's file
+if args.migrate_packed:
+    log_name = "migrate"
+elif args.reconcile:
+    log_name = "reconcile"
+elif args.loop:
+    log_name = "sync"
+else:
+    log_name = "run"
+
+# Queue-based logging: the sync thread only enqueues, a background thread writes
+setup_logging(
+    LOG_DIR,
+    log_name=log_name,
+    json_lines=args.log_json or LOG_FORMAT == "json",
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT
+)
+
+# Per-record events are counted and rolled up into one summary per cycle
+events = EventSummary()
+
 OUTPUT_DIR = Path(__file__).parent / "output"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-def run_upload():
-    """Executes the full log retrieval and upload process."""
-    # Returns: uploaded_count for SmartTiming
-    logging.info("iClock sync started.")
-    device_names = [device['name'] for device in DEVICES]
-    print("Devices loaded:", device_names)
-    logging.info(f"Devices loaded: {DEVICES}")
+# Maximum number of logs uploaded in one cycle before the upload is aborted
+UPLOAD_LIMIT = 300
 
-    timestamp_str = format_timestamp_str(datetime.now()).replace(":", "-").replace(" ", "_")
-    output_file = OUTPUT_DIR / f"logs_{timestamp_str}.json"
+def get_time_window():
+    """Returns the (start, end) window from --since or --from/--to; either bound may be None."""
+    if args.since is not None:
+        start = datetime.now() - timedelta(days=args.since)
+    else:
+        start = args.from_time
 
-    # Fetch Logs from Devices
-    raw_logs = []
+    return start, args.to_time
+
+def widen_to_whole_days(start, end):
+    """Widens a (start, end) window outwards to midnight boundaries; None bounds stay open."""
+    if start is not None:
+        start = datetime.combine(start.date(), datetime.min.time())
+    if end is not None and end.time() != datetime.min.time():
+        end = datetime.combine(end.date() + timedelta(days=1), datetime.min.time())
+    return start, end
+
+def fetch_raw_logs(start=None, end=None):
+    """Fetches raw logs in the time window from all configured devices. Returns {device name: logs}."""
+    if start is not None or end is not None:
+        logging.info(f"Selecting logs in window {start} - {end}.")
+
+    watermarks = load_device_watermarks()
+    raw_logs = {}
     for device in DEVICES:
         print(f"Connecting to {device['name']}")
         logging.info(f"Connecting to {device['name']} at {device['ip']}")
-        device_logs = get_logs_from_device(device['ip'])
+        device_logs = get_logs_from_device(device['ip'], start, end, watermarks=watermarks)
         print(f"Retrieved {len(device_logs)} records from {device['name']}")
         logging.info(f"Retrieved {len(device_logs)} records from {device['name']} ({device['ip']})")
-        raw_logs.extend(device_logs)
+        raw_logs[device['name']] = device_logs
 
-    total_records = len(raw_logs)
+    save_device_watermarks(watermarks)
+
+    total_records = sum(len(device_logs) for device_logs in raw_logs.values())
     print(f"Total records fetched from all devices: {total_records}")
     logging.info(f"Total records fetched from all devices: {total_records}")
 
-    if args.since is not None:
-        cutoff_time = datetime.now() - timedelta(days=args.since)
-        raw_logs = [log for log in raw_logs if log.timestamp >= cutoff_time]
-        logging.info(f"Filtered logs from past {args.since} days.")
+    return raw_logs
 
-    # Normalize Logs with validation
+def normalize_logs(raw_logs):
+    """Normalizes raw logs per device, skipping records with invalid or empty staffId values."""
     normalized_logs = []
     invalid_count = 0
-    for log in raw_logs:
-        try:
-            normalized_log = normalize_sdk_log(log)
-            normalized_logs.append(normalized_log)
-        except ValueError as e:
-            invalid_count += 1
-            logging.warning(f"Skipped invalid log: {e}")
+    for device_name, device_logs in raw_logs.items():
+        for log in device_logs:
+            try:
+                normalized_log = normalize_sdk_log(log, device=device_name)
+                normalized_logs.append(normalized_log)
+            except ValueError as e:
+                invalid_count += 1
+                events.record("Skipped invalid log", e, level=logging.WARNING)
     
     if invalid_count > 0:
         print(f"⚠️  Skipped {invalid_count} logs with invalid staffId")
-        logging.info(f"Skipped {invalid_count} logs with invalid staffId")
 
     # Skip logs with empty staffId values
-    normalized_logs = [log for log in normalized_logs if str(log["staffId"]).strip()]
+    return [log for log in normalized_logs if str(log["staffId"]).strip()]
+
+def update_summaries(normalized_logs):
+    """Folds normalized logs into the daily summaries, saving and pushing only touched days."""
+    summaries = load_daily_summaries()
+    touched = update_daily_summaries(summaries, normalized_logs)
+    if not touched:
+        logging.info("Daily summaries up to date.")
+        return
+
+    if args.dry_run:
+        print(f"Dry run - {len(touched)} daily summaries would be updated.")
+        logging.info(f"Dry run - {len(touched)} daily summaries would be updated.")
+        return
+
+    if args.push_summaries:
+        try:
+            written = upload_daily_summaries(summaries, touched)
+            logging.info(f"Pushed {written} daily summaries to Firestore.")
+        except Exception as e:
+            # Keep the local store unchanged so the same days are retried next cycle
+            logging.error(f"Error pushing daily summaries: {e}")
+            print(f"Failed to push daily summaries: {e}")
+            return
+
+    save_daily_summaries(summaries)
+    print(f"Updated {len(touched)} daily summaries.")
+    logging.info(f"Updated {len(touched)} daily summaries.")
+
+def run_upload():
+    """Executes the full log retrieval and upload process."""
+    # Returns: uploaded_count for SmartTiming
+    logging.info("iClock sync started.")
+    device_names = [device['name'] for device in DEVICES]
+    print("Devices loaded:", device_names)
+    logging.info(f"Devices loaded: {DEVICES}")
+
+    timestamp_str = format_timestamp_str(datetime.now()).replace(":", "-").replace(" ", "_")
+    output_file = OUTPUT_DIR / f"logs_{timestamp_str}.json"
+
+    # Daily summaries must be folded from whole days, or a partial first/last day would
+    # overwrite the correct remote summary for that day
+    start, end = get_time_window()
+    summarize = (args.summaries or args.push_summaries) and not (args.export_simple or args.export_normalized)
+    fetch_start, fetch_end = widen_to_whole_days(start, end) if summarize else (start, end)
+
+    # Fetch Logs from Devices
+    raw_logs = fetch_raw_logs(fetch_start, fetch_end)
+
+    # Normalize Logs with validation
+    normalized_logs = normalize_logs(raw_logs)
+
+    # Maintain per-staff daily summaries, then narrow back to the requested window
+    if summarize:
+        update_summaries(normalized_logs)
+        if (fetch_start, fetch_end) != (start, end):
+            normalized_logs = [
+                log for log in normalized_logs
+                if (start is None or log["timestamp"] >= start) and (end is None or log["timestamp"] < end)
+            ]
 
     # Export simplified logs if requested
     if args.export_simple:
-        simple_logs = [convert_to_simple_log(log) for log in raw_logs]
+        simple_logs = [convert_to_simple_log(log) for device_logs in raw_logs.values() for log in device_logs]
         simple_output_file = OUTPUT_DIR / f"simplified_logs_{timestamp_str}.json"
         with open(simple_output_file, "w", encoding="utf-8") as f:
             json.dump(simple_logs, f, indent=4)
@@ -141,30 +292,40 @@ def run_upload():
         logs_to_upload.append(log)
 
     # Abort if suspiciously high volume of logs is queued for upload
-    if len(logs_to_upload) > 300:
+    if len(logs_to_upload) > UPLOAD_LIMIT:
         logging.error(f"Aborting upload: {len(logs_to_upload)} logs to upload exceeds safety limit")
-        print(f"Too many logs to upload ({len(logs_to_upload)} > 300). Exiting to prevent potential error.")
-        return
+        print(f"Too many logs to upload ({len(logs_to_upload)} > {UPLOAD_LIMIT}). Exiting to prevent potential error.")
+        return 0
 
     new_logs = []
     uploaded_count = 0
-    for log in tqdm(logs_to_upload, desc="Uploading logs", unit=" log"):
-        if args.dry_run:
-            new_logs.append(log)
-        else:
-            try:
-                result = upload_log_to_firestore(log)
-                if result == "uploaded":
-                    new_logs.append(log)
-                    uploaded_count += 1
-                elif result == "exists":
-                    # Add existing record ID to cache to prevent future attempts
-                    uploaded_doc_ids.add(log["doc_id"])
-                    logging.info(f"Added existing record to cache: {log['doc_id']}")
-                else:
-                    logging.warning(f"Log upload failed: {log['doc_id']}")
-            except Exception as e:
-                logging.error(f"Error uploading log {log['doc_id']}: {e}")
+    if PACKED_LAYOUT and not args.dry_run:
+        # One map-merge write per day bucket instead of one read + write per punch
+        try:
+            new_logs, bucket_count = upload_logs_packed(logs_to_upload, layout=PACKED_LAYOUT)
+            uploaded_count = len(new_logs)
+            print(f"Packed {uploaded_count} logs into {bucket_count} day documents.")
+        except Exception as e:
+            logging.error(f"Error uploading packed logs: {e}")
+            print(f"Failed to upload packed logs: {e}")
+    else:
+        for log in tqdm(logs_to_upload, desc="Uploading logs", unit=" log"):
+            if args.dry_run:
+                new_logs.append(log)
+            else:
+                try:
+                    result = upload_log_to_firestore(log)
+                    if result == "uploaded":
+                        new_logs.append(log)
+                        uploaded_count += 1
+                    elif result == "exists":
+                        # Add existing record ID to cache to prevent future attempts
+                        uploaded_doc_ids.add(log["doc_id"])
+                        events.record("Added existing record to cache", log["doc_id"])
+                    else:
+                        events.record("Log upload failed", log["doc_id"], level=logging.WARNING)
+                except Exception as e:
+                    events.record("Error uploading log", f"{log['doc_id']}: {e}", level=logging.ERROR)
 
     if skipped_count:
         logging.info(f"Skipped {skipped_count} already-uploaded logs.")
@@ -198,9 +359,92 @@ def run_upload():
     # Return upload count for SmartTiming
     return uploaded_count if not args.dry_run else len(new_logs) if 'new_logs' in locals() else 0
 
+def run_reconcile():
+    """Merges Firestore document IDs into the local cache and reports differences."""
+    logging.info("Cache reconciliation started.")
+    start, end = get_time_window()
+
+    # Stream remote IDs with paged queries instead of one point read per record
+    remote_ids = set(tqdm(stream_doc_ids(start=start, end=end), desc="Reading Firestore IDs", unit=" id"))
+    if PACKED_LAYOUT:
+        # Include per-punch documents too, since they may not have been migrated yet
+        remote_ids.update(tqdm(
+            stream_packed_doc_ids(start=start, end=end, layout=PACKED_LAYOUT),
+            desc="Reading packed Firestore IDs", unit=" id"
+        ))
+    print(f"Found {len(remote_ids)} documents in Firestore.")
+    logging.info(f"Found {len(remote_ids)} documents in Firestore (window: {start} - {end}).")
+
+    device_ids = {log["doc_id"] for log in normalize_logs(fetch_raw_logs(start, end))}
+    uploaded_doc_ids = load_uploaded_ids_cache()
+
+    missing_remote = device_ids - remote_ids
+    remote_only = remote_ids - uploaded_doc_ids
+    stale_cached = missing_remote & uploaded_doc_ids
+
+    print(f"Device records missing in Firestore: {len(missing_remote)}")
+    print(f"Firestore records missing from local cache: {len(remote_only)}")
+    print(f"Stale cache entries (cached but not in Firestore): {len(stale_cached)}")
+    logging.info(
+        f"Reconciliation: {len(missing_remote)} missing remotely, "
+        f"{len(remote_only)} remote-only, {len(stale_cached)} stale cache entries."
+    )
+
+    if args.dry_run:
+        print("Dry run complete - cache not modified.")
+        logging.info("Dry run complete - cache not modified.")
+        return
+
+    # Merge remote IDs into the cache
+    uploaded_doc_ids.update(remote_ids)
+
+    # Optionally drop stale entries so those records are uploaded next sync
+    if args.prune_stale and stale_cached:
+        if len(stale_cached) > UPLOAD_LIMIT:
+            # Pruning this many would make every sync cycle abort on the upload limit
+            print(f"⚠️  Not pruning: {len(stale_cached)} stale entries exceed the upload limit ({UPLOAD_LIMIT}). "
+                  f"Re-run with a smaller --from/--to window.")
+            logging.warning(f"Not pruning {len(stale_cached)} stale cache entries: exceeds upload limit ({UPLOAD_LIMIT}).")
+        else:
+            uploaded_doc_ids.difference_update(stale_cached)
+            print(f"Pruned {len(stale_cached)} stale cache entries.")
+            logging.info(f"Pruned {len(stale_cached)} stale cache entries.")
+    save_uploaded_ids_cache(uploaded_doc_ids)
+
+    timestamp_str = format_timestamp_str(datetime.now()).replace(":", "-").replace(" ", "_")
+    report_file = OUTPUT_DIR / f"reconcile_{timestamp_str}.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "from": start,
+            "to": end,
+            "missing_remote": sorted(missing_remote),
+            "remote_only": sorted(remote_only),
+            "stale_cached": sorted(stale_cached),
+        }, f, indent=4, default=str)
+    print(f"Cache updated ({len(uploaded_doc_ids)} IDs). Report saved to {report_file}")
+    logging.info(f"Cache updated ({len(uploaded_doc_ids)} IDs). Report saved to {report_file}")
+
+def run_migrate_packed():
+    """Copies existing per-punch Firestore logs into the packed staff layout."""
+    start, end = get_time_window()
+    logging.info(f"Packed migration started (window: {start} - {end}, dry run: {args.dry_run}).")
+    punch_count, bucket_count = migrate_to_packed(start=start, end=end, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"Dry run complete - {punch_count} logs would be packed into {bucket_count} day documents.")
+        logging.info(f"Dry run complete - {punch_count} logs would be packed into {bucket_count} day documents.")
+    else:
+        print(f"Migration complete - {punch_count} logs packed into {bucket_count} day documents.")
+        logging.info(f"Migration complete - {punch_count} logs packed into {bucket_count} day documents.")
+
 def main():
     """Main execution function, handles looping behavior."""
-    if args.loop:
+    if args.migrate_packed:
+        run_migrate_packed()
+        events.flush()
+    elif args.reconcile:
+        run_reconcile()
+        events.flush()
+    elif args.loop:
         # Use SmartTiming for graduated rest levels
         smart_timer = SmartTiming(base_interval=args.loop)
         print(f"Starting smart sync: base {args.loop}s with graduated rest (Active → Rest → Nap → Sleep → Dream)")
@@ -209,6 +453,7 @@ def main():
         try:
             while True:
                 uploaded_count = run_upload()
+                events.flush()
                 
                 # Get next interval based on activity and time of day
                 next_interval = smart_timer.get_next_interval(uploaded_count)
@@ -220,6 +465,7 @@ def main():
             logging.info("Smart sync stopped by user.")
     else:
         run_upload()
+        events.flush()
 
 def entrypoint():
     main()
@@ -228,5 +474,11 @@ def entrypoint():
 # Example Usage:
 # python cli.py --loop 30                  # sync every 30 seconds
 # python cli.py --since 2 --dry-run        # preview past 2 days of logs
+# python cli.py --from 2025-03-24 --to 2025-03-24  # reprocess a single day
 # python cli.py --export-simple            # export only
+# python cli.py --reconcile --since 30     # warm cache from Firestore for past 30 days
+# python cli.py --reconcile --since 1 --prune-stale  # also re-queue cached IDs missing remotely
+# python cli.py --loop 30 --push-summaries # sync and keep daily summaries in Firestore
+# python cli.py --migrate-packed --dry-run # preview copying per-punch logs to packed layout
+# python cli.py --loop 30 --write-mode packed-staff  # one write per staff per day
 
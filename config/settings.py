@@ -46,3 +46,28 @@ DEVICE_TIMEOUT = int(os.getenv("DEVICE_TIMEOUT", 5))
 
 # Path to Firebase Admin SDK key (JSON file)
 FIREBASE_KEY_PATH = os.getenv("FIREBASE_KEY", "config/firebase-key.json")
+
+# ----------------------------------------
+# Logging Configuration
+# ----------------------------------------
+
+# Log file format: "text" (default) or "json" for structured JSON lines
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()
+
+# Rotate the log file once it reaches this size in bytes (default: 5 MB)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 5_000_000))
+
+# Number of rotated log files to keep (default: 5)
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+
+# ----------------------------------------
+# Firestore Write Mode
+# ----------------------------------------
+
+# Storage layout: "per-punch" (default, staffAttendanceLogs), "packed-staff" (staffDailyPunches)
+# or "packed-device" (deviceDailyPunches)
+WRITE_MODE = os.getenv("WRITE_MODE", "per-punch").strip().lower()
+
+# Validate that the write mode is one of the supported layouts
+if WRITE_MODE not in ("per-punch", "packed-staff", "packed-device"):
+    raise ValueError("WRITE_MODE must be one of: per-punch, packed-staff, packed-device.")
@@ -28,29 +28,24 @@ db = firestore.client()
 
 
 # ----------------------------------------
-# Firestore Upload Function
+# Log Validation
 # ----------------------------------------
 
-def upload_log_to_firestore(log: dict):
+def _validate_log(log: dict) -> bool:
     """
-    Uploads a single attendance log to Firestore if it doesn't already exist.
+    Checks that a normalized log has all required fields and a valid staffId.
 
     Parameters:
-        log (dict): A dictionary containing normalized log data. Expected keys:
-            - doc_id: Unique document identifier (MD5 hash).
-            - staffId: Unique staff ID.
-            - timestamp: Attendance timestamp.
-            - status: Attendance status (IN/OUT).
-            - workCode: Associated work code or reason.
+        log (dict): A dictionary containing normalized log data.
 
     Returns:
-        str: "exists" if the log already existed, "uploaded" if successfully uploaded, False on error.
+        bool: True if the log can be uploaded, False otherwise (the reason is logged).
     """
     # Validate required fields before upload
     required_fields = ["doc_id", "staffId", "timestamp", "status", "workCode"]
     for field in required_fields:
         if field not in log or log[field] is None:
-            logging.error(f"Missing required field '{field}' in log: {log}")
+            logging.error(f"Missing required field '{field}' in log: {log.get('doc_id')}")
             return False
     
     # Validate staffId is not empty or invalid
@@ -68,12 +63,64 @@ def upload_log_to_firestore(log: dict):
     except (ValueError, TypeError):
         logging.error(f"Invalid staffId '{staff_id}' must be numeric: {log['doc_id']}")
         return False
-    
+
+    return True
+
+
+def _commit_in_batches(writes) -> int:
+    """
+    Commits set() writes in Firestore batches of up to 500 operations.
+
+    Parameters:
+        writes (iterable): (document reference, data, merge) tuples.
+
+    Returns:
+        int: Number of write operations committed.
+    """
+    batch = db.batch()
+    pending = 0
+    written = 0
+    for doc_ref, doc_data, merge in writes:
+        batch.set(doc_ref, doc_data, merge=merge)
+        pending += 1
+        if pending == 500:
+            batch.commit()
+            written += pending
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+        written += pending
+    return written
+
+
+# ----------------------------------------
+# Firestore Upload Function
+# ----------------------------------------
+
+def upload_log_to_firestore(log: dict):
+    """
+    Uploads a single attendance log to Firestore if it doesn't already exist.
+
+    Parameters:
+        log (dict): A dictionary containing normalized log data. Expected keys:
+            - doc_id: Unique document identifier (MD5 hash).
+            - staffId: Unique staff ID.
+            - timestamp: Attendance timestamp.
+            - status: Attendance status (IN/OUT).
+            - workCode: Associated work code or reason.
+
+    Returns:
+        str: "exists" if the log already existed, "uploaded" if successfully uploaded, False on error.
+    """
+    if not _validate_log(log):
+        return False
+
     doc_ref = db.collection("staffAttendanceLogs").document(log["doc_id"])
 
     # Check if the document already exists to prevent duplication
     if doc_ref.get().exists:
-        logging.info(f"Log already exists in Firestore: {log['doc_id']}")
+        logging.debug(f"Log already exists in Firestore: {log['doc_id']}")
         return "exists"
 
     # Prepare the data payload for Firestore
@@ -89,3 +136,286 @@ def upload_log_to_firestore(log: dict):
     doc_ref.set(doc_data)
     # logging.info(f"Log uploaded to Firestore: {log['doc_id']}")
     return "uploaded"
+
+
+# ----------------------------------------
+# Bulk Document ID Streaming (Cache Reconciliation)
+# ----------------------------------------
+
+def stream_doc_ids(start=None, end=None, page_size: int = 1000):
+    """
+    Streams document IDs from the staffAttendanceLogs collection for a timestamp range.
+
+    Uses a single paginated query projected to the timestamp field only (needed as the
+    page cursor). Each page is one query round trip instead of one point read per record.
+
+    Parameters:
+        start (datetime, optional): Inclusive lower bound on the log timestamp.
+        end (datetime, optional): Exclusive upper bound on the log timestamp.
+        page_size (int): Number of documents fetched per page.
+
+    Yields:
+        str: Document IDs (MD5 hashes) of the matching logs.
+    """
+    query = db.collection("staffAttendanceLogs")
+    if start is not None:
+        query = query.where("timestamp", ">=", start)
+    if end is not None:
+        query = query.where("timestamp", "<", end)
+    query = query.order_by("timestamp").select(["timestamp"])
+
+    for snapshot in _stream_pages(query, page_size):
+        yield snapshot.id
+
+
+def _stream_pages(query, page_size: int):
+    """
+    Streams the snapshots of an ordered query one page at a time using cursors.
+
+    The query must be ordered and any projection must include the ordering field.
+
+    Parameters:
+        query: Ordered Firestore query.
+        page_size (int): Number of documents fetched per page.
+
+    Yields:
+        DocumentSnapshot: Matching documents, in query order.
+    """
+    last_snapshot = None
+    while True:
+        page_query = query.limit(page_size)
+        if last_snapshot is not None:
+            page_query = page_query.start_after(last_snapshot)
+
+        page = list(page_query.stream())
+        yield from page
+
+        if len(page) < page_size:
+            break
+        last_snapshot = page[-1]
+
+
+# ----------------------------------------
+# Daily Summary Upload
+# ----------------------------------------
+
+def upload_daily_summaries(summaries: dict, keys) -> int:
+    """
+    Writes the given per-staff daily summaries to the staffDailySummaries collection.
+
+    Only the listed keys are written, using batched writes (up to 500 per commit).
+
+    Parameters:
+        summaries (dict): Summaries keyed by summary_key() (see core.summarizer).
+        keys (iterable): Keys of the summaries to write.
+
+    Returns:
+        int: Number of summary documents written.
+    """
+    collection = db.collection("staffDailySummaries")
+    return _commit_in_batches(
+        (collection.document(key), dict(summaries[key], updatedAt=firestore.SERVER_TIMESTAMP), False)
+        for key in keys
+    )
+
+
+# ----------------------------------------
+# Packed Daily-Document Write Mode
+# ----------------------------------------
+
+# Collections holding one document per staff member (or device) per day
+PACKED_COLLECTIONS = {
+    "staff": "staffDailyPunches",
+    "device": "deviceDailyPunches"
+}
+
+
+def packed_doc_id(log: dict, layout: str = "staff") -> str:
+    """
+    Builds the daily bucket document ID for a log.
+
+    Example: "1024_2025-03-24" (staff layout) or "Gate 1 Device_2025-03-24" (device layout)
+
+    Parameters:
+        log (dict): A normalized log. The device layout requires a "device" key.
+        layout (str): "staff" or "device".
+
+    Returns:
+        str: Bucket document ID.
+    """
+    owner = log["staffId"] if layout == "staff" else str(log["device"]).replace("/", "-")
+    return f"{owner}_{log['timestamp'].strftime('%Y-%m-%d')}"
+
+
+def _pack_logs(logs: list, layout: str) -> dict:
+    """Groups logs into daily bucket payloads keyed by packed_doc_id()."""
+    owner_field = "staffId" if layout == "staff" else "device"
+    buckets = {}
+    for log in logs:
+        bucket_id = packed_doc_id(log, layout)
+        bucket = buckets.setdefault(bucket_id, {
+            owner_field: log[owner_field],
+            "date": log["timestamp"].strftime("%Y-%m-%d"),
+            "punches": {},
+            "updatedAt": firestore.SERVER_TIMESTAMP
+        })
+        # Punches are keyed by the per-punch doc_id, so re-sending a punch is idempotent
+        bucket["punches"][log["doc_id"]] = {
+            "staffId": log["staffId"],
+            "timestamp": log["timestamp"],
+            "status": log["status"],
+            "workCode": log["workCode"]
+        }
+    return buckets
+
+
+def upload_logs_packed(logs: list, layout: str = "staff"):
+    """
+    Uploads logs as map-merge updates into one document per staff member (or device) per day.
+
+    Each bucket document is written with set(merge=True), keyed by generate_doc_id() inside
+    the "punches" map, so the number of writes equals the number of day buckets touched
+    and duplicate punches are merged rather than duplicated. No existence reads are made.
+
+    Parameters:
+        logs (list): Normalized logs (see upload_log_to_firestore for expected keys).
+        layout (str): "staff" (staffDailyPunches) or "device" (deviceDailyPunches).
+
+    Returns:
+        tuple: (list of logs written, number of bucket documents written).
+    """
+    valid_logs = [log for log in logs if _validate_log(log)]
+    if layout == "device":
+        valid_logs = [log for log in valid_logs if log.get("device")]
+
+    collection = db.collection(PACKED_COLLECTIONS[layout])
+    buckets = _pack_logs(valid_logs, layout)
+    written = _commit_in_batches(
+        (collection.document(bucket_id), bucket, True) for bucket_id, bucket in buckets.items()
+    )
+    logging.info(f"Packed {len(valid_logs)} logs into {written} {layout} day documents.")
+    return valid_logs, written
+
+
+def unpack_punches(doc_data: dict) -> list:
+    """
+    Expands a packed daily document into per-punch logs shaped like staffAttendanceLogs.
+
+    Parameters:
+        doc_data (dict): Data of a staffDailyPunches or deviceDailyPunches document.
+
+    Returns:
+        list: Log dictionaries with doc_id, staffId, timestamp, status and workCode, sorted by timestamp.
+    """
+    punches = [dict(punch, doc_id=doc_id) for doc_id, punch in doc_data.get("punches", {}).items()]
+    return sorted(punches, key=lambda punch: punch["timestamp"])
+
+
+def read_packed_logs(date: str, layout: str = "staff", owner: str = None) -> list:
+    """
+    Reads all punches for a day from the packed collection, in per-punch log format.
+
+    Parameters:
+        date (str): Day in YYYY-MM-DD format.
+        layout (str): "staff" or "device".
+        owner (str, optional): Restrict to one staffId (staff layout) or device name (device layout).
+
+    Returns:
+        list: Per-punch log dictionaries (see unpack_punches).
+    """
+    collection = db.collection(PACKED_COLLECTIONS[layout])
+    if owner is not None:
+        snapshot = collection.document(f"{str(owner).replace('/', '-')}_{date}").get()
+        return unpack_punches(snapshot.to_dict()) if snapshot.exists else []
+
+    logs = []
+    for snapshot in collection.where("date", "==", date).stream():
+        logs.extend(unpack_punches(snapshot.to_dict()))
+    return sorted(logs, key=lambda log: log["timestamp"])
+
+
+def stream_packed_doc_ids(start=None, end=None, layout: str = "staff", page_size: int = 500):
+    """
+    Streams per-punch document IDs stored in the packed collection for a timestamp range.
+
+    Parameters:
+        start (datetime, optional): Inclusive lower bound on the log timestamp.
+        end (datetime, optional): Exclusive upper bound on the log timestamp.
+        layout (str): "staff" or "device".
+        page_size (int): Number of day documents fetched per page.
+
+    Yields:
+        str: Per-punch document IDs (MD5 hashes) of the matching logs.
+    """
+    query = db.collection(PACKED_COLLECTIONS[layout])
+    if start is not None:
+        query = query.where("date", ">=", start.strftime("%Y-%m-%d"))
+    if end is not None:
+        query = query.where("date", "<=", end.strftime("%Y-%m-%d"))
+    query = query.order_by("date").select(["date", "punches"])
+
+    for snapshot in _stream_pages(query, page_size):
+        for log in unpack_punches(snapshot.to_dict()):
+            timestamp = log["timestamp"].replace(tzinfo=None)
+            if (start is None or timestamp >= start) and (end is None or timestamp < end):
+                yield log["doc_id"]
+
+
+def migrate_to_packed(start=None, end=None, page_size: int = 1000, dry_run: bool = False):
+    """
+    Copies existing per-punch staffAttendanceLogs documents into the staffDailyPunches layout.
+
+    The per-punch documents are left in place; the copy is idempotent and can be re-run.
+    Each page is packed and committed as it streams, so an interrupted run keeps the pages
+    already written. A day split across two pages is simply merged twice.
+    Only the staff layout can be migrated, since per-punch documents carry no device name.
+
+    Parameters:
+        start (datetime, optional): Inclusive lower bound on the log timestamp.
+        end (datetime, optional): Exclusive upper bound on the log timestamp.
+        page_size (int): Number of per-punch documents read and committed per page.
+        dry_run (bool): Count what would be written without writing.
+
+    Returns:
+        tuple: (number of punches read, number of distinct day documents written or to be written).
+    """
+    query = db.collection("staffAttendanceLogs")
+    if start is not None:
+        query = query.where("timestamp", ">=", start)
+    if end is not None:
+        query = query.where("timestamp", "<", end)
+    query = query.order_by("timestamp")
+
+    collection = db.collection(PACKED_COLLECTIONS["staff"])
+    punch_count = 0
+    bucket_ids = set()
+
+    def commit_page(page_logs):
+        buckets = _pack_logs(page_logs, "staff")
+        bucket_ids.update(buckets)
+        if not dry_run:
+            _commit_in_batches(
+                (collection.document(bucket_id), bucket, True) for bucket_id, bucket in buckets.items()
+            )
+
+    page_logs = []
+    for snapshot in _stream_pages(query, page_size):
+        data = snapshot.to_dict()
+        page_logs.append({
+            "doc_id": snapshot.id,
+            "staffId": data["staffId"],
+            "timestamp": data["timestamp"],
+            "status": data["status"],
+            "workCode": data["workCode"]
+        })
+        if len(page_logs) == page_size:
+            commit_page(page_logs)
+            punch_count += len(page_logs)
+            page_logs = []
+    if page_logs:
+        commit_page(page_logs)
+        punch_count += len(page_logs)
+
+    if not dry_run:
+        logging.info(f"Migrated {punch_count} per-punch logs into {len(bucket_ids)} staff day documents.")
+    return punch_count, len(bucket_ids)
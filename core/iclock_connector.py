@@ -2,26 +2,125 @@
 iclock_connector.py - Connects to ZKTeco iClock devices to fetch attendance logs
 
 This module provides functionality for connecting to one or multiple ZKTeco iClock devices,
-retrieving raw attendance logs, and aggregating them for further processing.
+retrieving raw attendance logs, and aggregating them for further processing. Time-window
+selection (--since / --from / --to) is applied here, before any normalization happens.
 
 Author: Hussain Shareef (@kudadonbe)
 Date: 2025-03-26
 """
 
 import logging
+from datetime import datetime
 from zk import ZK
 
+from core.utils import format_timestamp_str
+
+
+# ----------------------------------------
+# Time-Window Selection
+# ----------------------------------------
+
+def _bisect_left(logs: list, timestamp: datetime) -> int:
+    """Returns the index of the first log at or after timestamp in a timestamp-sorted list."""
+    low, high = 0, len(logs)
+    while low < high:
+        mid = (low + high) // 2
+        if logs[mid].timestamp < timestamp:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+# Records checked past the stop point, so a single backwards clock jump is not taken as the window start
+_LOOKBACK = 16
+
+
+def _filter_window(logs: list, start: datetime = None, end: datetime = None) -> list:
+    """Filters logs with start <= timestamp < end by visiting every record."""
+    return [
+        log for log in logs
+        if (start is None or log.timestamp >= start) and (end is None or log.timestamp < end)
+    ]
+
+
+def _select_window(logs: list, start: datetime = None, end: datetime = None):
+    """
+    Selects the logs with start <= timestamp < end, reporting whether the walked tail was in order.
+
+    Returns:
+        tuple: (logs inside the window, True if no out-of-order record was seen).
+    """
+    # Walk back from the newest record and stop at the first one before start
+    low = len(logs)
+    while low > 0:
+        timestamp = logs[low - 1].timestamp
+        if low < len(logs) and timestamp > logs[low].timestamp:
+            # Clock jump inside the tail: fall back to a full filter so no punch is dropped
+            return _filter_window(logs, start, end), False
+        if start is not None and timestamp < start:
+            if any(log.timestamp >= start for log in logs[max(low - 1 - _LOOKBACK, 0):low - 1]):
+                return _filter_window(logs, start, end), False
+            break
+        low -= 1
+
+    tail = logs[low:]
+    if end is not None:
+        tail = tail[:_bisect_left(tail, end)]
+    return tail, True
+
+
+def select_time_window(logs: list, start: datetime = None, end: datetime = None) -> list:
+    """
+    Selects the raw logs with start <= timestamp < end.
+
+    Device storage is in append order, so the list is walked back from the newest record and
+    the walk stops at the first record before start (after checking a few records further
+    back); older records are never visited. The end bound is then found with a binary search
+    over the walked tail. If an out-of-order record (clock jump) turns up, a full filter is
+    used instead so no punch is dropped.
+
+    Parameters:
+        logs (list): Raw attendance log objects.
+        start (datetime, optional): Inclusive lower bound.
+        end (datetime, optional): Exclusive upper bound.
+
+    Returns:
+        list: Logs inside the window, in their original order.
+    """
+    if start is None and end is None:
+        return logs
+    return _select_window(logs, start, end)[0]
+
+
+def _watermark_excludes_window(watermark: dict, records: int, start: datetime, end: datetime) -> bool:
+    """Checks whether an unchanged device (same record count) can have no logs in the window."""
+    if not watermark or watermark.get("records") != records or records == 0:
+        return False
+    first = datetime.strptime(watermark["first"], "%Y-%m-%d %H:%M:%S")
+    last = datetime.strptime(watermark["last"], "%Y-%m-%d %H:%M:%S")
+    return (start is not None and start > last) or (end is not None and end <= first)
+
 
 # ----------------------------------------
 # Device Connection and Log Retrieval
 # ----------------------------------------
 
-def get_logs_from_device(device_ip: str):
+def get_logs_from_device(device_ip: str, start: datetime = None, end: datetime = None,
+                         watermarks: dict = None):
     """
-    Connects to a ZKTeco iClock device and retrieves raw attendance logs.
+    Connects to a ZKTeco iClock device and retrieves raw attendance logs within a time window.
+
+    When watermarks are given, the device's record count is read first. If it is unchanged
+    since the last fetch and the stored first/last timestamps show no records in the window,
+    the full log download is skipped. The watermark for the device is updated in place, and
+    dropped when out-of-order records are seen.
 
     Parameters:
         device_ip (str): IP address of the ZKTeco device.
+        start (datetime, optional): Inclusive lower bound on the log timestamp.
+        end (datetime, optional): Exclusive upper bound on the log timestamp.
+        watermarks (dict, optional): Per-device {"records", "first", "last"} keyed by IP.
 
     Returns:
         list: A list of raw attendance log objects from the device. Returns an empty list if the connection fails.
@@ -29,32 +128,59 @@ def get_logs_from_device(device_ip: str):
     zk = ZK(device_ip, port=4370, timeout=5)
     try:
         conn = zk.connect()
-        logs = conn.get_attendance()
-        conn.disconnect()
+        try:
+            if watermarks is not None and (start is not None or end is not None):
+                conn.read_sizes()
+                if _watermark_excludes_window(watermarks.get(device_ip), conn.records, start, end):
+                    logging.info(f"Skipped device at {device_ip}: no records in window per watermark")
+                    return []
+            logs = conn.get_attendance()
+        finally:
+            conn.disconnect()
         logging.info(f"Successfully retrieved {len(logs)} logs from device at {device_ip}")
-        return logs
     except Exception as e:
         logging.error(f"Error connecting to device at {device_ip}: {e}")
         return []
 
+    if start is None and end is None:
+        selected, in_order = logs, True
+    else:
+        selected, in_order = _select_window(logs, start, end)
+
+    if watermarks is not None:
+        if logs and in_order:
+            # Append order: the first and last records bound the device's time range
+            watermarks[device_ip] = {
+                "records": len(logs),
+                "first": format_timestamp_str(logs[0].timestamp),
+                "last": format_timestamp_str(logs[-1].timestamp)
+            }
+        else:
+            # Out-of-order records make first/last unreliable, so never skip this device
+            watermarks.pop(device_ip, None)
+
+    return selected
+
 
 # ----------------------------------------
 # Multiple Device Log Aggregation
 # ----------------------------------------
 
-def fetch_logs_from_multiple_devices(devices: list):
+def fetch_logs_from_multiple_devices(devices: list, start: datetime = None, end: datetime = None):
     """
     Fetches and aggregates logs from multiple ZKTeco iClock devices.
 
     Parameters:
         devices (list): A list of IP addresses for the devices.
+        start (datetime, optional): Inclusive lower bound on the log timestamp.
+        end (datetime, optional): Exclusive upper bound on the log timestamp.
 
     Returns:
         list: A combined list of raw attendance logs from all specified devices.
     """
     all_logs = []
     for ip in devices:
-        device_logs = get_logs_from_device(ip)
+        device_logs = get_logs_from_device(ip, start, end)
         all_logs.extend(device_logs)
         # logging.info(f"Aggregated {len(device_logs)} logs from device {ip}")
 
@@ -0,0 +1,149 @@
+"""
+logging_setup.py - Non-blocking logging pipeline for the iClock-Sync project
+
+Routes all log records through an in-memory queue to a background writer thread, so the
+sync loop never waits on file I/O. Log files rotate by size instead of a new file being
+created per process, and records can optionally be written as structured JSON lines.
+Repetitive per-record events are counted and rolled up into one summary per sync cycle.
+
+Author: Hussain Shareef (@kudadonbe)
+Date: 2025-03-26
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+
+# ----------------------------------------
+# Formatters
+# ----------------------------------------
+
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects."""
+
+    def format(self, record):
+        """Serializes the record's time, level, message and any extra event fields."""
+        entry = {
+            "time": datetime.fromtimestamp(record.created).strftime(DATE_FORMAT),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        event = getattr(record, "event", None)
+        if event is not None:
+            entry["event"] = event
+            entry["count"] = getattr(record, "count", None)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# ----------------------------------------
+# Queue-Based Logging Setup
+# ----------------------------------------
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps exc_info so the file handler's formatter renders tracebacks."""
+
+    def prepare(self, record):
+        """Merges message arguments but, unlike the default, leaves exc_info on the record."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(log_dir: Path, log_name: str = "sync", json_lines: bool = False,
+                  max_bytes: int = 5_000_000, backup_count: int = 5, level: int = logging.INFO):
+    """
+    Configures the root logger to write through a queue to a rotating log file.
+
+    The calling thread only enqueues records; a QueueListener thread performs formatting
+    and file writes. The listener is stopped (and the queue drained) at interpreter exit.
+
+    RotatingFileHandler is not safe across processes (on Windows rollover fails while another
+    process holds the file), so each kind of process that may run concurrently must use its
+    own log_name.
+
+    Parameters:
+        log_dir (Path): Directory for the log file (created if missing).
+        log_name (str): Base name of the log file, e.g. "sync" -> sync.log / sync.jsonl.
+        json_lines (bool): Write structured JSON lines instead of plain text.
+        max_bytes (int): Size at which the log file is rotated.
+        backup_count (int): Number of rotated log files to keep.
+        level (int): Root logging level.
+
+    Returns:
+        QueueListener: The running background listener.
+    """
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_file = log_dir / (f"{log_name}.jsonl" if json_lines else f"{log_name}.log")
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        str(log_file), maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    if json_lines:
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_InProcessQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+# ----------------------------------------
+# Per-Cycle Event Aggregation
+# ----------------------------------------
+
+class EventSummary:
+    """Counts repetitive per-record events and logs them as one summary per cycle."""
+
+    def __init__(self, sample_limit=5):
+        """
+        Initialize an empty event summary.
+
+        Args:
+            sample_limit: Number of individual occurrences logged per event before
+                          further occurrences are only counted.
+        """
+        self.sample_limit = sample_limit
+        self.counts = Counter()
+        self.levels = {}
+
+    def record(self, event, detail=None, level=logging.INFO):
+        """Counts one occurrence of an event, logging the detail for the first few only."""
+        self.counts[event] += 1
+        self.levels[event] = max(level, self.levels.get(event, level))
+        if detail is not None and self.counts[event] <= self.sample_limit:
+            logging.log(level, f"{event}: {detail}")
+
+    def flush(self):
+        """Logs one summary line per event recorded this cycle and resets the counters."""
+        for event, count in self.counts.items():
+            suppressed = max(count - self.sample_limit, 0)
+            message = f"{event}: {count} occurrence(s) this cycle"
+            if suppressed:
+                message += f" ({suppressed} not logged individually)"
+            logging.log(self.levels[event], message, extra={"event": event, "count": count})
+        self.counts.clear()
+        self.levels.clear()
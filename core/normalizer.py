@@ -11,7 +11,7 @@ Date: 2025-03-26
 from core.utils import generate_doc_id
 
 
-def normalize_sdk_log(log):
+def normalize_sdk_log(log, device: str = None):
     """
     Normalizes a raw attendance log from the ZKTeco SDK into a structured dictionary.
 
@@ -22,6 +22,7 @@ def normalize_sdk_log(log):
              - timestamp: The timestamp of the attendance event.
              - status: The attendance status (e.g., check-in or check-out).
              - punch: Work code associated with the attendance log.
+        device (str, optional): Name of the device the log was retrieved from.
 
     Returns:
         dict: Structured log dictionary with the following keys:
@@ -30,6 +31,7 @@ def normalize_sdk_log(log):
               - timestamp: Datetime object representing attendance time.
               - status: Integer status code.
               - workCode: Integer representing the work code.
+              - device: Device name (only when device is given).
               
     Raises:
         ValueError: If user_id is invalid (None, empty, 0, or non-numeric).
@@ -48,13 +50,16 @@ def normalize_sdk_log(log):
     
     doc_id = generate_doc_id(log.user_id, log.timestamp)
 
-    return {
+    normalized = {
         "doc_id": doc_id,
         "staffId": str(log.user_id),
         "timestamp": log.timestamp,
         "status": int(log.status),
         "workCode": int(log.punch)
     }
+    if device is not None:
+        normalized["device"] = device
+    return normalized
 
 
 def convert_to_simple_log(log):
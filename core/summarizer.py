@@ -0,0 +1,113 @@
+"""
+summarizer.py - Maintains per-staff daily attendance summaries
+
+This module folds normalized attendance logs into one summary per staff member per day
+(first/last punch, punch count and status sequence). Summaries are updated incrementally:
+only the days touched by new punches are rewritten, so consumers can read one summary
+document instead of every raw log for that staff member and day.
+
+Author: Hussain Shareef (@kudadonbe)
+Date: 2025-03-26
+"""
+
+import json
+import logging
+import os
+
+
+# ----------------------------------------
+# Summary Key Utility
+# ----------------------------------------
+
+def summary_key(staff_id: str, date: str) -> str:
+    """
+    Builds the summary identifier for a staff member and day.
+
+    Example: "1024_2025-03-24"
+
+    Parameters:
+        staff_id (str): The unique identifier of the staff member.
+        date (str): Day in YYYY-MM-DD format.
+
+    Returns:
+        str: Summary identifier, also used as the Firestore document ID.
+    """
+    return f"{staff_id}_{date}"
+
+
+# ----------------------------------------
+# Incremental Summary Update
+# ----------------------------------------
+
+def update_daily_summaries(summaries: dict, logs: list) -> set:
+    """
+    Merges normalized logs into the per-staff daily summaries in place.
+
+    Punches are keyed by time within a day, so re-applying the same logs is a no-op and
+    only summaries that actually gained a punch are reported as touched.
+
+    Parameters:
+        summaries (dict): Existing summaries keyed by summary_key().
+        logs (list): Normalized log dictionaries (see normalize_sdk_log).
+
+    Returns:
+        set: Keys of the summaries that changed.
+    """
+    touched = set()
+    for log in logs:
+        date = log["timestamp"].strftime("%Y-%m-%d")
+        time = log["timestamp"].strftime("%H:%M:%S")
+        key = summary_key(log["staffId"], date)
+
+        summary = summaries.setdefault(key, {"staffId": log["staffId"], "date": date, "punches": []})
+        if any(punch["time"] == time for punch in summary["punches"]):
+            continue
+
+        summary["punches"].append({"time": time, "status": log["status"], "workCode": log["workCode"]})
+        touched.add(key)
+
+    for key in touched:
+        summary = summaries[key]
+        summary["punches"].sort(key=lambda punch: punch["time"])
+        summary["firstPunch"] = f"{summary['date']} {summary['punches'][0]['time']}"
+        summary["lastPunch"] = f"{summary['date']} {summary['punches'][-1]['time']}"
+        summary["punchCount"] = len(summary["punches"])
+        summary["statusSequence"] = [punch["status"] for punch in summary["punches"]]
+
+    return touched
+
+
+# ----------------------------------------
+# Local Summary Store
+# ----------------------------------------
+
+def load_daily_summaries(cache_path: str = "cache/daily_summaries.json") -> dict:
+    """
+    Loads per-staff daily summaries from a specified JSON file.
+
+    Parameters:
+        cache_path (str): Path to the summaries file.
+
+    Returns:
+        dict: Summaries keyed by summary_key(). Returns an empty dict if the file does not exist or fails to read.
+    """
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except Exception as e:
+            logging.warning(f"Failed to read summaries {cache_path}: {e}")
+            return {}
+
+
+def save_daily_summaries(summaries: dict, cache_path: str = "cache/daily_summaries.json"):
+    """
+    Saves per-staff daily summaries to a specified JSON file.
+
+    Parameters:
+        summaries (dict): Summaries keyed by summary_key().
+        cache_path (str): Path to save the summaries file.
+    """
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=4)
@@ -252,3 +252,35 @@ def save_uploaded_ids_cache(doc_ids: set, cache_path: str = "cache/uploaded_ids_
     """
     with open(cache_path, "w", encoding="utf-8") as f:
         json.dump(list(doc_ids), f, indent=4)
+
+
+def load_device_watermarks(cache_path: str = "cache/device_watermarks.json") -> dict:
+    """
+    Loads per-device watermarks (record count, first and last timestamp) from a JSON file.
+
+    Parameters:
+        cache_path (str): Path to the watermarks file.
+
+    Returns:
+        dict: Watermarks keyed by device IP. Returns an empty dict if the file does not exist or fails to read.
+    """
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except Exception as e:
+            logging.warning(f"Failed to read watermarks {cache_path}: {e}")
+            return {}
+
+
+def save_device_watermarks(watermarks: dict, cache_path: str = "cache/device_watermarks.json"):
+    """
+    Saves per-device watermarks to a specified JSON file.
+
+    Parameters:
+        watermarks (dict): Watermarks keyed by device IP.
+        cache_path (str): Path to save the watermarks file.
+    """
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, indent=4)